@@ -11,16 +11,22 @@
 # Imports
 # ---------------------------------------------------------------------------
 
-from collections import ChainMap
 from typing import List, Set, Dict, Tuple, Optional
+import io
 import pickle
-import os
+import sys
 from colorama import init, Fore, Back, Style
-import datetime
+import time
 
 ColumnID = int
 TaskID = int
 
+_BLUE, _WHITE, _RED = Fore.BLUE, Fore.WHITE, Fore.RED
+_BACK_COLORS: Tuple[str, ...] = tuple(Back.__dict__.values())
+_PROMPT: str = _BLUE + '> ' + _WHITE
+_PROMPT_NAME: str = _BLUE + '\tName: ' + _WHITE
+_PROMPT_TASK_ID: str = _BLUE + '\tTask ID: ' + _WHITE
+
 def trim_string(my_str: str, max_size: int) -> str:
     if len(my_str) <= max_size:
         return my_str
@@ -31,109 +37,149 @@ def trim_string(my_str: str, max_size: int) -> str:
 
 
 class Task:
+    __slots__ = ('m_id', 'm_name', 'm_messages', '_str_cache')
     LAST_TASK_ID: TaskID = 0
     def __init__(self, name: str):
         self.m_id : TaskID = Task.LAST_TASK_ID
         self.m_name : str = name
-        self.m_messages : List[str] = []
+        self.m_messages : str = ''
+        self._str_cache : str = f"{self.m_id}. {self.m_name}"
         Task.LAST_TASK_ID += 1
 
     def get_id(self) -> TaskID:
         return self.m_id
 
     def add_message(self, msg: str):
-        self.m_messages.append(msg)
+        self.m_messages += f'\t{msg}\n'
 
-    def get_messages(self) -> List[str]:
+    def get_messages(self) -> str:
         return self.m_messages
 
     def __str__(self):
-        return f"{self.m_id}. {self.m_name}"
+        return self._str_cache
+
+    def __getstate__(self):
+        return (self.m_id, self.m_name, self.m_messages)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            state = (state['m_id'], state['m_name'], ''.join(f'\t{msg}\n' for msg in state['m_messages']))
+        self.m_id, self.m_name, self.m_messages = state
+        self._str_cache = f"{self.m_id}. {self.m_name}"
         
         
 class Column:
+    __slots__ = ('m_name', 'm_tasks')
+
     def __init__(self, name: str):
         self.m_name : str = name
-        self.m_tasks : List[Task] = []
+        self.m_tasks : Dict[TaskID, Task] = {}
 
-    def add_task(self, task: Task) -> bool:
-        if not task in self.m_tasks:
-            self.m_tasks.append(task)
-            task.add_message(f'> {self.m_name} : {datetime.datetime.now().strftime("%Y%m%d %H:%M:%S")}')
+    def add_task(self, task: Task, is_new: bool = False) -> bool:
+        if is_new or not task.get_id() in self.m_tasks:
+            self.m_tasks[task.get_id()] = task
+            task.add_message(f'> {self.m_name} : {time.strftime("%Y%m%d %H:%M:%S")}')
             return True
         else:
             return False
 
     def remove_task(self, task_id: TaskID) -> Task:
-        selected_tasks = [task for task in self.m_tasks if task.get_id() == task_id]
-        if selected_tasks:
-            self.m_tasks = [t for t in self.m_tasks if not t in selected_tasks]
-            return selected_tasks[0]
-        else:
-            return None
+        return self.m_tasks.pop(task_id, None)
 
     def contains(self, task_id: TaskID) -> bool:
-        return len([task for task in self.m_tasks if task.get_id() == task_id]) > 0
+        return task_id in self.m_tasks
 
-    def get_contents(self) -> Dict[str, List[str]]:
-        return {self.m_name: [str(k) for k in self.m_tasks]}
+    def __getstate__(self):
+        return (self.m_name, self.m_tasks)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            state = (state['m_name'], {task.get_id(): task for task in state['m_tasks']})
+        self.m_name, self.m_tasks = state
 
 class Board:
+    __slots__ = ('m_columns', 'm_task_column')
+    FINISHED_TASKS_FILE: str = 'finished_tasks.txt'
+
     def __init__(self):
         self.m_columns : List[Column] = []
+        self.m_task_column : Dict[TaskID, ColumnID] = {}
 
     def add_column(self, name: str) -> ColumnID:
         new_column = Column(name)
         self.m_columns.append(new_column)
         return len(self.m_columns) - 1
 
-    def add_task(self, column_id: ColumnID, task: Task) -> bool:
-        if column_id < len(self.m_columns):
-            self.m_columns[column_id].add_task(task)
+    def add_task(self, column_id: ColumnID, task: Task, is_new: bool = False) -> bool:
+        if 0 <= column_id < len(self.m_columns) and (is_new or not task.get_id() in self.m_task_column):
+            self.m_columns[column_id].add_task(task, is_new)
+            self.m_task_column[task.get_id()] = column_id
             return True
         else:
             return False
 
-    def move_task(self, column_id: ColumnID, task_id: Task) -> bool:
-        if column_id < len(self.m_columns):
-            moving_tasks = list(filter(None, [col.remove_task(task_id) for col in self.m_columns]))
-            if moving_tasks:
-                assert(len(moving_tasks) == 1)
-                self.m_columns[column_id].add_task(moving_tasks[0])
-                return True
-        return False
+    def move_task(self, column_id: ColumnID, task_id: TaskID) -> bool:
+        src = self.m_task_column.get(task_id)
+        if src is None or src == column_id or not 0 <= column_id < len(self.m_columns):
+            return False
+        task = self.m_columns[src].remove_task(task_id)
+        self.m_columns[column_id].add_task(task)
+        self.m_task_column[task_id] = column_id
+        return True
 
     def advance(self, task_id: TaskID) -> bool:
-        selected_column = list(filter(lambda i: i[1].contains(task_id), enumerate(self.m_columns)))
-        if selected_column:
-            assert(len(selected_column) == 1)
-            col_id, col = selected_column[0]
-            new_col = col_id + 1
-            task = col.remove_task(task_id)
-            assert(task and new_col <= len(self.m_columns))
-            if new_col < len(self.m_columns):
-                self.m_columns[new_col].add_task(task)
-            else:
-                with open('finished_tasks.txt', 'a') as file:
-                    file.write(f'{str(task)}\n')
-                    for msg in task.get_messages():
-                        file.write(f'\t{msg}\n')
-            return True
-        return False
+        src = self.m_task_column.get(task_id)
+        if src is None:
+            return False
+        new_col = src + 1
+        task = self.m_columns[src].remove_task(task_id)
+        if new_col < len(self.m_columns):
+            self.m_columns[new_col].add_task(task)
+            self.m_task_column[task_id] = new_col
+        else:
+            del self.m_task_column[task_id]
+            with open(Board.FINISHED_TASKS_FILE, 'a') as file:
+                file.write(Board._finished_record(task))
+        return True
 
     def clean_completed(self) -> int:
-        last_column_ids = [k.get_id() for k in self.m_columns[-1].m_tasks]
-        for task_id in last_column_ids:
-            self.advance(task_id)
-        return len(last_column_ids)
+        last_column = self.m_columns[-1]
+        num_tasks = len(last_column.m_tasks)
+        if num_tasks:
+            with open(Board.FINISHED_TASKS_FILE, 'a') as file:
+                file.write(''.join(Board._finished_record(task) for task in last_column.m_tasks.values()))
+            for task_id in last_column.m_tasks:
+                del self.m_task_column[task_id]
+            last_column.m_tasks.clear()
+        return num_tasks
             
-    def remove_task(self, task_id: Task) -> bool:
-        removing_tasks = list(filter(None, [col.remove_task(task_id) for col in self.m_columns]))
-        assert(len(removing_tasks) == 1)
-        return len(removing_tasks) > 0
+    def remove_task(self, task_id: TaskID) -> bool:
+        src = self.m_task_column.pop(task_id, None)
+        if src is None:
+            return False
+        self.m_columns[src].remove_task(task_id)
+        return True
+
+    @staticmethod
+    def _finished_record(task: Task) -> str:
+        return f'{str(task)}\n{task.get_messages()}'
+
+    def rebuild_index(self):
+        self.m_task_column = {task_id: col_id
+                              for col_id, col in enumerate(self.m_columns)
+                              for task_id in col.m_tasks}
+
+    def __getstate__(self):
+        return (self.m_columns,)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            state = (state['m_columns'],)
+        self.m_columns, = state
+        self.rebuild_index()
             
     def get_contents(self) -> Dict[str, List[str]]:
-        return dict(ChainMap(*[col.get_contents() for col in self.m_columns]))
+        return {col.m_name: [str(t) for t in col.m_tasks.values()] for col in reversed(self.m_columns)}
 
 
 class Kanban:
@@ -142,6 +188,8 @@ class Kanban:
     TABULATOR_SIZE: int = 4
     MAX_TAB_NAME_LEN: int = (SCREEN_WIDTH // 4) * 3
     MAX_NAME_DESCRIPTION: int = SCREEN_WIDTH - (TABULATOR_SIZE + 5 )
+    _HPAD: str = '\u2500' * (SCREEN_WIDTH - 3)
+    _TAB: str = ' ' * TABULATOR_SIZE
 
     def __init__(self, columns: List[str]):
         self.m_board = Board()
@@ -149,92 +197,106 @@ class Kanban:
             self.m_board.add_column(col)
 
     def load(self, filename: str) -> bool:
-        if os.path.exists(filename):
+        try:
             with open( filename, 'rb' ) as file:
-                Task.LAST_TASK_ID = pickle.load( file )
-                self.m_board = pickle.load( file )
+                unpickler = pickle.Unpickler( io.BytesIO( file.read() ) )
+                saved = unpickler.load()
+            if isinstance(saved, int):
+                # Older versions pickled the last task id and the board separately
+                Task.LAST_TASK_ID, self.m_board = saved, unpickler.load()
+            else:
+                Task.LAST_TASK_ID, self.m_board = saved
             return True
-        else:
+        except FileNotFoundError:
             return False
     
     def save(self, filename: str) -> bool:
+        data = pickle.dumps((Task.LAST_TASK_ID, self.m_board), protocol=pickle.HIGHEST_PROTOCOL)
         with open( filename, 'wb' ) as file:
-            pickle.dump(Task.LAST_TASK_ID , file)
-            pickle.dump(self.m_board , file)
+            file.write(data)
         return True
 
     def run(self):
+        commands = Kanban.COMMANDS
+        prompt = _PROMPT
         finish = False
         while not finish:
-            print(Fore.BLUE + '> ' + Fore.WHITE, end='')
+            print(prompt, end='')
             cmd = input('').strip()
-            if (cmd_upper := cmd.upper()) in Kanban.COMMANDS:
-                finish = Kanban.COMMANDS[cmd_upper](self)
+            handler = commands.get(cmd.upper())
+            if handler:
+                finish = handler(self)
             else:
-                print(Fore.RED + f'Error: Cannot understand "{cmd}". Type HELP.')
+                print(f'{_RED}Error: Cannot understand "{cmd}". Type HELP.')
 
     def _show_menu(self) -> bool:
         for cmd, _ in Kanban.COMMANDS.items():
-            print(Fore.BLUE + f'\t* {cmd}')
+            print(f'{_BLUE}\t* {cmd}')
         return False
 
     def _list_tasks(self) -> bool:
-        colors = dict(Back.__dict__.items())
-        print (Fore.WHITE)
+        contents = self.m_board.get_contents()
+        width = Kanban.SCREEN_WIDTH
+        name_width = width - Kanban.TABULATOR_SIZE - 5
+        tab = Kanban._TAB
+        lines = [_WHITE]
         last_color = None
-        for color_name, (col_name, tasks_descriptions) in zip(colors.keys(), self.m_board.get_contents().items()):
+        for color, (col_name, tasks_descriptions) in zip(_BACK_COLORS, contents.items()):
             col_name_trimmed = trim_string (col_name, Kanban.MAX_TAB_NAME_LEN)
             border = '\u2500' * (len(col_name_trimmed) + 6)
+            gap = width - len(border) - 4
+            hline = '\u2500' * gap
             if not last_color:
-                print(colors[color_name] + f'\u250C{border}\u2510')
-                print(colors[color_name] + f'\u2502 *** { col_name_trimmed } \u2514' + '\u2500' * (Kanban.SCREEN_WIDTH - len(border) - 4) + '\u2510')
+                lines.append(f'{color}\u250C{border}\u2510')
+                lines.append(f'{color}\u2502 *** {col_name_trimmed} \u2514{hline}\u2510')
             else:
-                print(colors[color_name] + f'\u251C{border}\u2510' + colors[last_color] + ' ' * (Kanban.SCREEN_WIDTH - len(border) - 4) + '\u2502')
-                print(colors[color_name] + f'\u2502 *** { col_name_trimmed } \u2514' + '\u2500' * (Kanban.SCREEN_WIDTH - len(border) - 4) + '\u2524')
+                lines.append(f'{color}\u251C{border}\u2510{last_color}{" " * gap}\u2502')
+                lines.append(f'{color}\u2502 *** {col_name_trimmed} \u2514{hline}\u2524')
             for desc in tasks_descriptions:
                 descr_trimmed = trim_string (desc, Kanban.MAX_NAME_DESCRIPTION)
-                print(colors[color_name] + f'\u2502{" " * Kanban.TABULATOR_SIZE}- { descr_trimmed }{" " * (Kanban.SCREEN_WIDTH - len(descr_trimmed)- Kanban.TABULATOR_SIZE - 5)}\u2502')
-            last_color = color_name
-        if self.m_board.get_contents().keys():
-            print(colors[color_name] + f'\u2514' + '\u2500' * (Kanban.SCREEN_WIDTH - 3) + '\u2518')
-        print (Back.RESET)
+                lines.append(f'{color}\u2502{tab}- {descr_trimmed}{" " * (name_width - len(descr_trimmed))}\u2502')
+            last_color = color
+        if contents:
+            lines.append(f'{color}\u2514{Kanban._HPAD}\u2518')
+        lines.append(Back.RESET)
+        sys.stdout.write('\n'.join(lines) + '\n')
         return False
 
     def _new_task(self) -> bool:
-        print(Fore.BLUE + '\tName: ' + Fore.WHITE, end='')
+        print(_PROMPT_NAME, end='')
         task_name = input('').strip()
         task = Task(task_name)
-        self.m_board.add_task(0, task)
-        print(Fore.BLUE + f'\tTask created with id {task.get_id()}.')
+        self.m_board.add_task(0, task, is_new=True)
+        print(f'{_BLUE}\tTask created with id {task.get_id()}.')
         return False
 
     def _advance_task(self) -> bool:
-        print(Fore.BLUE + '\tTask ID: ' + Fore.WHITE, end='')
+        print(_PROMPT_TASK_ID, end='')
         task_id_str = input('').strip()
         try:
             task_id = int(task_id_str)
             self.m_board.advance(task_id)
         except ValueError:
-            print(Fore.RED + f'\tError: Number expected.')
+            print(f'{_RED}\tError: Number expected.')
         return False
 
     def _clean_completed(self) -> bool:
         num_tasks = self.m_board.clean_completed()
-        print(Fore.BLUE + f'{num_tasks} tasks cleaned.' + Fore.WHITE) if num_tasks else print(Fore.BLUE + 'No tasks to be cleaned.')
+        print(f'{_BLUE}{num_tasks} tasks cleaned.{_WHITE}') if num_tasks else print(f'{_BLUE}No tasks to be cleaned.')
         return False
     
     def _remove_task(self) -> bool:
-        print(Fore.BLUE + '\tTask ID: ' + Fore.WHITE, end='')
+        print(_PROMPT_TASK_ID, end='')
         task_id_str = input('').strip()
         try:
             task_id = int(task_id_str)
             self.m_board.remove_task(task_id)
         except ValueError:
-            print(Fore.RED + f'\tError: Number expected.')
+            print(f'{_RED}\tError: Number expected.')
         return False
     
     def _quit(self) -> bool:
-        print(Fore.BLUE + f'Goodbye.\n')
+        print(f'{_BLUE}Goodbye.\n')
         return True
     
     COMMANDS = {
@@ -254,8 +316,7 @@ if __name__ == '__main__':
     kanban = Kanban(columns)
 
     filename = 'kanban.dat'
-    if os.path.exists(filename):
-        kanban.load(filename)
+    kanban.load(filename)
 
     kanban.run()
 